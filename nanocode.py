@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """nanocode - minimal claude code alternative"""
 
-import glob as globlib, json, os, re, subprocess, urllib.request
+import base64, collections, concurrent.futures, fnmatch, functools, glob as globlib, http.client, io, itertools, json, os, re, selectors, signal, stat, subprocess, sys, threading, time, urllib.parse, urllib.request
 
 # === Configuration (from environment variables) ===
 API_BASE = os.getenv("API_BASE", "http://localhost:8080/v1").rstrip("/")
@@ -9,6 +9,13 @@ API_KEY = os.getenv("API_KEY", "")
 MODEL = os.getenv("MODEL")  # None if not set
 TOOL_CALL_PARSER_NAME = os.getenv("TOOL_CALL_PARSER")  # e.g., "glm" or None
 
+SKIP_DIRS = {"node_modules", "__pycache__", "venv"}  # pruned from tree walks, like dot dirs
+GREP_CACHE_BYTES = 256 * 1024 * 1024  # file contents kept between grep calls
+GREP_CACHE_MAX_FILE = 16 * 1024 * 1024  # larger files are streamed, not cached
+BASH_TIMEOUT = 30  # seconds of wall clock per command
+BASH_MAX_LINES = 10000  # output lines kept for the model
+BASH_MAX_CHARS = 512 * 1024  # output characters kept for the model
+
 # ANSI colors
 RESET, BOLD, DIM = "\033[0m", "\033[1m", "\033[2m"
 BLUE, CYAN, GREEN, YELLOW, RED = (
@@ -18,89 +25,318 @@ BLUE, CYAN, GREEN, YELLOW, RED = (
     "\033[33m",
     "\033[31m",
 )
+BASH_PREFIX, BASH_SUFFIX = f"  {DIM}│ ", f"{RESET}\n"  # around each echoed output line
+
+# JSON: orjson when installed (faster, encodes straight to bytes), json otherwise
+try:
+    import orjson
+
+    dumps, loads = orjson.dumps, orjson.loads
+except ImportError:
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    loads = json.loads
 
 
 # --- Tool implementations ---
 
 
 def read(args):
-    lines = open(args["path"]).readlines()
     offset = args.get("offset", 0)
-    limit = args.get("limit", len(lines))
-    selected = lines[offset : offset + limit]
-    return "".join(f"{offset + idx + 1:4}| {line}" for idx, line in enumerate(selected))
+    limit = args.get("limit")
+    stop = offset + limit if limit is not None else None
+    with open(args["path"]) as f:
+        # Stop reading at offset + limit instead of loading the whole file
+        selected = itertools.islice(f, offset, stop)
+        return "".join(f"{offset + idx + 1:4}| {line}" for idx, line in enumerate(selected))
+
+
+def write_file(path, text):
+    """Write text to a temp file and rename it over path, so path is never half-written.
+
+    FIFOs, devices and other special files are written in place instead of replaced."""
+    path = os.path.realpath(path)  # through symlinks, not over them
+    data = memoryview(text.encode())
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        st = None
+    if st is not None and not stat.S_ISREG(st.st_mode):
+        fd = os.open(path, os.O_WRONLY | os.O_TRUNC)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        return
+    directory, name = os.path.split(path)
+    while True:  # a fresh name created with O_EXCL, so no existing file is ever touched
+        tmp = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        if st is not None:
+            os.chmod(tmp, stat.S_IMODE(st.st_mode))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 def write(args):
-    with open(args["path"], "w") as f:
-        f.write(args["content"])
+    write_file(args["path"], args["content"])
     return "ok"
 
 
 def edit(args):
     text = open(args["path"]).read()
     old, new = args["old"], args["new"]
-    if old not in text:
+    if not old:
+        return "error: old_string is empty"
+    # One pass: split finds the occurrences; unless all=true, two are enough to reject
+    parts = text.split(old) if args.get("all") else text.split(old, 2)
+    if len(parts) == 1:
         return "error: old_string not found"
-    count = text.count(old)
-    if not args.get("all") and count > 1:
+    if len(parts) > 2 and not args.get("all"):
+        count = text.count(old)
         return f"error: old_string appears {count} times, must be unique (use all=true)"
-    replacement = (
-        text.replace(old, new) if args.get("all") else text.replace(old, new, 1)
-    )
-    with open(args["path"], "w") as f:
-        f.write(replacement)
+    write_file(args["path"], new.join(parts))
     return "ok"
 
 
+def glob_paths(pattern):
+    """Paths matching pattern; <dir>/**/<name> walks the tree with walk() pruning.
+
+    Other ** patterns go through glob, with results under SKIP_DIRS dropped unless named."""
+    root, sep, name = pattern.partition("/**/")
+    if (
+        not sep
+        or any(c in root for c in "*?[")
+        or "/" in name
+        or not name
+        or name.startswith(".")  # hidden names, which walk() skips
+        or fnmatch.filter(SKIP_DIRS, name)  # asking for a pruned dir by name
+    ):
+        paths = globlib.iglob(pattern, recursive=True)
+        if "**" not in pattern:
+            return paths
+        # A segment of only * or ** does not count as naming a pruned dir
+        named = {d for seg in pattern.split("/") if seg.strip("*") for d in fnmatch.filter(SKIP_DIRS, seg)}
+        pruned = SKIP_DIRS - named
+        return (path for path in paths if pruned.isdisjoint(path.split(os.sep)))
+    if any(c in name for c in "*?["):
+        matches = re.compile(fnmatch.translate(name)).match
+    else:
+        matches = name.__eq__
+    return (entry.path for entry in walk(root or "/") if matches(entry.name))
+
+
 def glob(args):
     pattern = (args.get("path", ".") + "/" + args["pat"]).replace("//", "/")
-    files = globlib.glob(pattern, recursive=True)
-    files = sorted(
-        files,
-        key=lambda f: os.path.getmtime(f) if os.path.isfile(f) else 0,
-        reverse=True,
-    )
-    return "\n".join(files) or "none"
+    entries = []  # (mtime, path) with one stat per path; non-files sort as 0
+    for path in glob_paths(pattern):
+        try:
+            st = os.stat(path)
+            mtime = st.st_mtime if stat.S_ISREG(st.st_mode) else 0
+        except OSError:
+            mtime = 0
+        entries.append((mtime, path))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return "\n".join(path for _, path in entries) or "none"
+
+
+def walk(root, ancestors=frozenset()):
+    """Yield DirEntry objects under root, pruning hidden entries and SKIP_DIRS.
+
+    Symlinked directories are followed like glob's ** does, except into their own ancestors."""
+    try:
+        st = os.stat(root)
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError:
+        return
+    ancestors = ancestors | {(st.st_dev, st.st_ino)}
+    for entry in entries:
+        if entry.name.startswith(".") or entry.name in SKIP_DIRS:
+            continue
+        yield entry
+        try:
+            if not entry.is_dir():
+                continue
+            if entry.is_symlink():
+                target = entry.stat()
+                if (target.st_dev, target.st_ino) in ancestors:
+                    continue  # symlink loop
+        except OSError:
+            continue
+        yield from walk(entry.path, ancestors)
+
+
+def compile_bytes_pattern(pat, flags=0):
+    """Bytes twin of an ASCII regex, for patterns that match ASCII text the same either way"""
+    # str \s also matches \x1c-\x1f, bytes \s does not
+    if not pat.isascii() or "\\s" in pat or "\\S" in pat:
+        return None
+    try:
+        return re.compile(pat.encode(), flags)
+    except re.error:  # str-only escapes such as \N{...}
+        return None
+
+
+_grep_cache = collections.OrderedDict()  # path -> ((mtime_ns, size), contents or None)
+_grep_cache_size = 0  # bytes held in _grep_cache
+_grep_cache_lock = threading.Lock()  # grep may run on TOOL_POOL threads
+
+
+def grep_source(entry):
+    """Contents of a file for grep: bytes, an open file if too big to cache, None if binary"""
+    global _grep_cache_size
+    st = entry.stat()
+    if st.st_size > GREP_CACHE_MAX_FILE:
+        f = open(entry.path, "rb")
+        if b"\0" in f.peek(8192)[:8192]:
+            f.close()
+            return None
+        return f
+
+    key = (st.st_mtime_ns, st.st_size)
+    with _grep_cache_lock:
+        cached = _grep_cache.get(entry.path)
+        if cached and cached[0] == key:
+            _grep_cache.move_to_end(entry.path)
+            return cached[1]
+
+    with open(entry.path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:8192]:
+        data = None  # binary file, remembered so it is not read again
+    elif b"\r\n" in data:
+        data = data.replace(b"\r\n", b"\n")  # as grep normalizes each line
+
+    with _grep_cache_lock:
+        old = _grep_cache.pop(entry.path, None)
+        if old:
+            _grep_cache_size -= len(old[1] or b"")
+        _grep_cache[entry.path] = (key, data)
+        _grep_cache_size += len(data or b"")
+        while _grep_cache_size > GREP_CACHE_BYTES:
+            _, (_, evicted) = _grep_cache.popitem(last=False)
+            _grep_cache_size -= len(evicted or b"")
+    return data
 
 
 def grep(args):
     pattern = re.compile(args["pat"])
+    bytes_pattern = compile_bytes_pattern(args["pat"])
+    # Whole-file prefilter for ASCII files: it can only over-match the per-line
+    # search, unless the pattern involves line ends or looks beyond the matched text
+    file_pattern = None
+    line_sensitive = ("$", "\n", "\\n", "\\A", "\\Z", "(?<", "(?=", "(?!")
+    if bytes_pattern and not any(t in args["pat"] for t in line_sensitive):
+        file_pattern = compile_bytes_pattern(args["pat"], re.MULTILINE)
     hits = []
-    for filepath in globlib.glob(args.get("path", ".") + "/**", recursive=True):
+    for entry in walk(args.get("path", ".")):
         try:
-            for line_num, line in enumerate(open(filepath), 1):
-                if pattern.search(line):
-                    hits.append(f"{filepath}:{line_num}:{line.rstrip()}")
+            if not entry.is_file():
+                continue
+            source = grep_source(entry)
+            if source is None:
+                continue  # binary file
+            if isinstance(source, bytes):
+                if file_pattern and source.isascii() and not file_pattern.search(source):
+                    continue
+                source = io.BytesIO(source)
+            with source as f:
+                for line_num, raw in enumerate(f, 1):
+                    if raw.endswith(b"\r\n"):
+                        raw = raw[:-2] + b"\n"
+                    # Only non-ASCII lines (or patterns) pay for decoding
+                    if bytes_pattern and raw.isascii():
+                        matched = bytes_pattern.search(raw)
+                    else:
+                        matched = pattern.search(raw.decode(errors="replace"))
+                    if matched:
+                        line = raw.decode(errors="replace")
+                        hits.append(f"{entry.path}:{line_num}:{line.rstrip()}")
+                        if len(hits) == 50:
+                            return "\n".join(hits)
         except Exception:
             pass
-    return "\n".join(hits[:50]) or "none"
+    return "\n".join(hits) or "none"
 
 
 def bash(args):
     proc = subprocess.Popen(
         args["cmd"], shell=True,
         stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        text=True
     )
-    output_lines = []
-    try:
+    output_lines = collections.deque()  # the tail, within BASH_MAX_LINES and BASH_MAX_CHARS
+    kept_chars = omitted = 0
+    deadline = time.monotonic() + BASH_TIMEOUT
+    pending = b""  # partial line carried over between reads, at most one byte over the cap
+
+    def emit(raw_lines):
+        nonlocal kept_chars, omitted
+        # One write and flush per chunk read, not per line
+        lines = [
+            raw.decode(errors="replace") + "\n"
+            if len(raw) <= BASH_MAX_CHARS
+            else raw[:BASH_MAX_CHARS].decode(errors="replace") + " ...(line truncated)\n"
+            for raw in raw_lines
+        ]
+        output_lines.extend(lines)
+        kept_chars += sum(map(len, lines))
+        while len(output_lines) > BASH_MAX_LINES or (kept_chars > BASH_MAX_CHARS and len(output_lines) > 1):
+            kept_chars -= len(output_lines.popleft())
+            omitted += 1
+        sys.stdout.write("".join(BASH_PREFIX + line.rstrip() + BASH_SUFFIX for line in lines))
+        sys.stdout.flush()
+
+    with proc, selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ)
+        timed_out = False
         while True:
-            line = proc.stdout.readline()
-            if not line and proc.poll() is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(proc.stdout.fileno(), 65536)
+            if not chunk:
                 break
-            if line:
-                print(f"  {DIM}│ {line.rstrip()}{RESET}", flush=True)
-                output_lines.append(line)
-        proc.wait(timeout=30)
-    except subprocess.TimeoutExpired:
-        proc.kill()
-        output_lines.append("\n(timed out after 30s)")
+            *lines, pending = (pending + chunk).split(b"\n")
+            pending = pending[: BASH_MAX_CHARS + 1]  # the rest of an overlong line is dropped
+            if lines:
+                emit(lines)
+        if pending:
+            emit([pending])
+        if not timed_out:
+            try:
+                proc.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                timed_out = True
+        if timed_out:
+            proc.kill()
+            output_lines.append(f"\n(timed out after {BASH_TIMEOUT}s)")
+    if omitted:
+        output_lines.appendleft(f"({omitted} earlier lines omitted)\n")
     return "".join(output_lines).strip() or "(empty)"
 
 
 # --- Tool definitions: (description, schema, function) ---
 
+SKIPPED = f"dot dirs and {', '.join(sorted(SKIP_DIRS))}; pass path to search inside one"
+
 TOOLS = {
     "read": (
         "Read file with line numbers (file path, not directory)",
@@ -118,12 +354,12 @@ TOOLS = {
         edit,
     ),
     "glob": (
-        "Find files by pattern, sorted by mtime",
+        "Find files by pattern, sorted by mtime (**/ skips " + SKIPPED + ")",
         {"pat": "string", "path": "string?"},
         glob,
     ),
     "grep": (
-        "Search files for regex pattern",
+        "Search files for regex pattern (skips " + SKIPPED + ")",
         {"pat": "string", "path": "string?"},
         grep,
     ),
@@ -135,11 +371,33 @@ TOOLS = {
 }
 
 
+# Tools without side effects, safe to run concurrently within one turn
+PARALLEL_TOOLS = {"read", "glob", "grep"}
+TOOL_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+
+_SURROGATE_RE = re.compile("[\ud800-\udfff]")
+
+
+def to_utf8_text(text):
+    """Replace lone surrogates (undecodable filenames, stdin bytes) so the text encodes as UTF-8"""
+    return _SURROGATE_RE.sub("\ufffd", text)
+
+
 def run_tool(name, args):
     try:
-        return TOOLS[name][2](args)
+        result = TOOLS[name][2](args)
     except Exception as err:
-        return f"error: {err}"
+        result = f"error: {err}"
+    return to_utf8_text(result)
+
+
+# Pattern: <tool_call>name<arg_key>k</arg_key><arg_value>v</arg_value>...</tool_call>
+# Scanned in one pass: the name opens a call, arg pairs fill it, the close tag emits it
+_TOOL_CALL_RE = re.compile(
+    r'<tool_call>(\w+)|<arg_key>([^<]*)</arg_key>\s*<arg_value>(.*?)</arg_value>|</tool_call>',
+    re.DOTALL,
+)
 
 
 def parse_glm_tool_calls(content):
@@ -148,45 +406,55 @@ def parse_glm_tool_calls(content):
         return [], content
 
     tool_calls = []
-    # Pattern: <tool_call>name<arg_key>k</arg_key><arg_value>v</arg_value>...</tool_call>
-    pattern = r'<tool_call>(\w+)((?:<arg_key>.*?</arg_key><arg_value>.*?</arg_value>)*)</tool_call>'
-
-    for i, match in enumerate(re.finditer(pattern, content, re.DOTALL)):
-        tool_name = match.group(1)
-        args_str = match.group(2)
-
-        # Parse arg_key/arg_value pairs
-        args = {}
-        arg_pattern = r'<arg_key>(.*?)</arg_key><arg_value>(.*?)</arg_value>'
-        for arg_match in re.finditer(arg_pattern, args_str, re.DOTALL):
-            key = arg_match.group(1)
-            value = arg_match.group(2)
+    kept = []  # content outside of complete tool calls
+    tool_name, args, call_start, pos, prev_end = None, {}, 0, 0, 0
+
+    for match in _TOOL_CALL_RE.finditer(content):
+        name, key, value = match.groups()
+        if name:
+            tool_name, args, call_start = name, {}, match.start()
+        elif tool_name is None:
+            continue  # arg pair or close tag outside of a tool call
+        elif content[prev_end : match.start()].strip():
+            tool_name = None  # only whitespace may separate the tags; keep it as content
+            continue
+        elif key is not None:
             # Try to parse as JSON, otherwise use as string
             try:
-                args[key] = json.loads(value)
+                args[key] = loads(value)
             except json.JSONDecodeError:
                 args[key] = value
-
-        tool_calls.append({
-            "id": f"call_{i}",
-            "type": "function",
-            "function": {
-                "name": tool_name,
-                "arguments": json.dumps(args)
-            }
-        })
+        else:
+            tool_calls.append({
+                "id": f"call_{len(tool_calls)}",
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "arguments": args  # a dict; main() encodes it for history
+                }
+            })
+            kept.append(content[pos:call_start])
+            pos = match.end()
+            tool_name = None
+        prev_end = match.end()
 
     # Remove tool_call tags from content
-    clean_content = re.sub(pattern, '', content, flags=re.DOTALL).rstrip()
+    kept.append(content[pos:])
+    clean_content = "".join(kept).rstrip()
 
     return tool_calls, clean_content
 
 
+def parse_no_tool_calls(content):
+    """Default parser: tool calls only come in the OpenAI tool_calls field"""
+    return [], content
+
+
 # Resolve TOOL_CALL_PARSER from environment variable
 def get_parser(name):
     if not name:
-        return None
-    return globals().get(f"parse_{name}_tool_calls")
+        return parse_no_tool_calls
+    return globals().get(f"parse_{name}_tool_calls") or parse_no_tool_calls
 
 TOOL_CALL_PARSER = get_parser(TOOL_CALL_PARSER_NAME)
 
@@ -221,36 +489,207 @@ def make_schema():
     return result
 
 
-def call_api(messages, system_prompt):
-    all_messages = [{"role": "system", "content": system_prompt}] + messages
-    payload = {
-        "max_tokens": 8192,
-        "messages": all_messages,
-        "tools": make_schema(),
-    }
+TOOL_SCHEMA = make_schema()  # TOOLS is static, so build the schema once
+
+
+# Single keep-alive connection to API_BASE, reused across turns of the agentic loop
+_api_url = urllib.parse.urlsplit(API_BASE)
+_connection = None
+
+# http_proxy / https_proxy / no_proxy, honoured the way urllib.request does
+_proxy = urllib.request.getproxies().get(_api_url.scheme)
+if _proxy and not urllib.request.proxy_bypass(_api_url.hostname):
+    _proxy_url = urllib.parse.urlsplit(_proxy if "://" in _proxy else "http://" + _proxy)
+else:
+    _proxy_url = None
+_proxy_headers = {}
+if _proxy_url and _proxy_url.username:
+    _credentials = urllib.parse.unquote(f"{_proxy_url.username}:{_proxy_url.password or ''}")
+    _proxy_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(_credentials.encode()).decode()
+
+
+def make_connection():
+    """Connection to API_BASE, directly or via the proxy (CONNECT tunnel for https)"""
+    https = _api_url.scheme == "https"
+    if not _proxy_url:
+        if https:
+            return http.client.HTTPSConnection(_api_url.netloc)
+        return http.client.HTTPConnection(_api_url.netloc)
+    proxy_address = (_proxy_url.hostname, _proxy_url.port or 80)
+    if https:
+        connection = http.client.HTTPSConnection(*proxy_address)
+        connection.set_tunnel(_api_url.hostname, _api_url.port, _proxy_headers)
+        return connection
+    return http.client.HTTPConnection(*proxy_address)
+
+
+def post(path, body, headers):
+    """POST over the kept-alive connection, reconnecting once if the server dropped it"""
+    global _connection
+    if _proxy_url and _api_url.scheme == "http":
+        # A plain http proxy takes the absolute URL and its credentials on every request
+        target, headers = API_BASE + path, {**headers, **_proxy_headers}
+    else:
+        target = _api_url.path + path
+    for attempt in (1, 2):
+        if _connection is None:
+            _connection = make_connection()
+        try:
+            _connection.request("POST", target, body, headers)
+            response = _connection.getresponse()
+        except (
+            http.client.RemoteDisconnected,
+            http.client.ImproperConnectionState,
+            BrokenPipeError,
+            ConnectionResetError,
+        ):
+            _connection.close()
+            if attempt == 2:
+                raise
+            continue
+        except Exception:
+            _connection.close()
+            raise
+        if response.status >= 300:
+            response.read()
+            if response.status < 400:  # redirects are not followed
+                location = response.getheader("Location")
+                raise RuntimeError(
+                    f"HTTP Error {response.status}: redirected to {location}, set API_BASE to it"
+                )
+            raise RuntimeError(f"HTTP Error {response.status}: {response.reason}")
+        return response
+
+
+def read_stream(response, on_content=None):
+    """Assemble a chat completion from server-sent events, passing content deltas to on_content"""
+    if not response.getheader("Content-Type", "").startswith("text/event-stream"):
+        return loads(response.read())  # server ignored stream=true
+
+    content = []
+    tool_calls = {}  # index -> tool call, filled in from argument fragments
+    for line in response:
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        chunk = loads(data)
+        if "error" in chunk:
+            raise RuntimeError(f"API error: {chunk['error']}")
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content"):
+                content.append(delta["content"])
+                if on_content:
+                    on_content(delta["content"])
+            for tc_delta in delta.get("tool_calls") or []:
+                tc = tool_calls.setdefault(
+                    tc_delta.get("index", 0),
+                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                tc["id"] = tc_delta.get("id") or tc["id"]
+                function = tc_delta.get("function") or {}
+                tc["function"]["name"] += function.get("name") or ""
+                tc["function"]["arguments"] += function.get("arguments") or ""
+    response.read()  # drain the rest so the connection can be reused
+
+    message = {"role": "assistant", "content": "".join(content)}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+        for tc in message["tool_calls"]:
+            tc["function"]["arguments"] = tc["function"]["arguments"] or "{}"
+    return {"choices": [{"message": message}]}
+
+
+def make_payload_head():
+    payload = {"max_tokens": 8192, "stream": True, "tools": TOOL_SCHEMA}
     if MODEL:
         payload["model"] = MODEL
-    request = urllib.request.Request(
-        API_BASE + "/chat/completions",
-        data=json.dumps(payload).encode(),
-        headers={
+    return dumps(payload)[:-1] + b',"messages":['
+
+
+PAYLOAD_HEAD = make_payload_head()  # everything in the request body but the messages
+_encoded_messages = []  # (message, bytes) pairs sent with the previous request
+
+
+def encode_messages(messages):
+    """Serialize messages, reusing the bytes of those already sent last turn"""
+    # History entries are never mutated after being appended, so identity is enough
+    encoded = []
+    for i, msg in enumerate(messages):
+        if i < len(_encoded_messages) and _encoded_messages[i][0] is msg:
+            encoded.append(_encoded_messages[i])
+        else:
+            encoded.append((msg, dumps(msg)))
+    _encoded_messages[:] = encoded
+    return [data for _, data in encoded]
+
+
+def call_api(messages, system_prompt, on_content=None):
+    system_message = dumps({"role": "system", "content": system_prompt})
+    body = PAYLOAD_HEAD + b",".join([system_message, *encode_messages(messages)]) + b"]}"
+    response = post(
+        "/chat/completions",
+        body,
+        {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {API_KEY}",
+            "Connection": "keep-alive",
         },
     )
-    response = urllib.request.urlopen(request)
-    return json.loads(response.read())
+    return read_stream(response, on_content)
 
 
+@functools.lru_cache(maxsize=1)  # cleared on SIGWINCH, see main()
 def separator():
     return f"{DIM}{'─' * min(os.get_terminal_size().columns, 80)}{RESET}"
 
 
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+
+
 def render_markdown(text):
-    return re.sub(r"\*\*(.+?)\*\*", f"{BOLD}\\1{RESET}", text)
+    return _BOLD_RE.sub(f"{BOLD}\\1{RESET}", text)
+
+
+def content_printer():
+    """Return (write, finish) that echo streamed content as it arrives.
+
+    Text from a * that may still open a **bold** span is held back until the span
+    closes or the line ends, so the output matches printing the content at once."""
+    started, pending = False, ""
+
+    def write(delta):
+        nonlocal started, pending
+        if not started:
+            sys.stdout.write(f"\n{CYAN}⏺{RESET} ")
+            started = True
+        *lines, pending = (pending + delta).split("\n")
+        last_end = 0
+        for match in _BOLD_RE.finditer(pending):
+            last_end = match.end()
+        cut = pending.find("*", last_end)  # a later * may still open a bold span
+        if cut < 0:
+            cut = len(pending)
+        lines.append(pending[:cut])
+        pending = pending[cut:]
+        sys.stdout.write("\n".join(render_markdown(line) for line in lines))
+        sys.stdout.flush()
+
+    def finish():
+        """End the block; True if anything was shown"""
+        if started:
+            sys.stdout.write(render_markdown(pending) + "\n")
+            sys.stdout.flush()
+        return started
+
+    return write, finish
 
 
 def main():
+    if hasattr(signal, "SIGWINCH"):  # terminal resized
+        signal.signal(signal.SIGWINCH, lambda *_: separator.cache_clear())
     print(f"{BOLD}nanocode{RESET} | {DIM}{MODEL} | {os.getcwd()}{RESET}\n")
     messages = []
     system_prompt = f"Concise coding assistant. cwd: {os.getcwd()}"
@@ -258,7 +697,7 @@ def main():
     while True:
         try:
             print(separator())
-            user_input = input(f"{BOLD}{BLUE}❯{RESET} ").strip()
+            user_input = to_utf8_text(input(f"{BOLD}{BLUE}❯{RESET} ").strip())
             print(separator())
             if not user_input:
                 continue
@@ -273,31 +712,41 @@ def main():
 
             # agentic loop: keep calling API until no more tool calls
             while True:
-                response = call_api(messages, system_prompt)
+                # Without a tool-call parser there is nothing to strip, so show content live
+                write, finish = content_printer()
+                live = TOOL_CALL_PARSER is parse_no_tool_calls
+                response = call_api(messages, system_prompt, write if live else None)
+                shown = finish()
                 message = response["choices"][0]["message"]
                 content = message.get("content", "")
 
                 # Parse tool calls using custom parser if configured
-                if TOOL_CALL_PARSER:
-                    parsed_tool_calls, clean_content = TOOL_CALL_PARSER(content)
-                else:
-                    parsed_tool_calls, clean_content = [], content
+                parsed_tool_calls, clean_content = TOOL_CALL_PARSER(content)
                 # Use OpenAI format if available, otherwise use parsed result
                 tool_calls = message.get("tool_calls") or parsed_tool_calls
 
-                if clean_content:
+                if clean_content and not shown:
                     print(f"\n{CYAN}⏺{RESET} {render_markdown(clean_content)}")
 
-                tool_results = []
+                calls = []
                 for tc in tool_calls:
-                    tool_name = tc["function"]["name"]
-                    tool_args = json.loads(tc["function"]["arguments"])
+                    arguments = tc["function"]["arguments"]
+                    # OpenAI tool_calls carry a JSON string, parsed ones the dict itself
+                    tool_args = arguments if isinstance(arguments, dict) else loads(arguments)
+                    calls.append((tc, tc["function"]["name"], tool_args))
+                # Overlap independent read-only tools; anything else runs in order
+                futures = None
+                if len(calls) > 1 and all(name in PARALLEL_TOOLS for _, name, _ in calls):
+                    futures = [TOOL_POOL.submit(run_tool, name, args) for _, name, args in calls]
+
+                tool_results = []
+                for i, (tc, tool_name, tool_args) in enumerate(calls):
                     arg_preview = str(list(tool_args.values())[0])[:50] if tool_args else ""
                     print(
                         f"\n{GREEN}⏺ {tool_name.capitalize()}{RESET}({DIM}{arg_preview}{RESET})"
                     )
 
-                    result = run_tool(tool_name, tool_args)
+                    result = futures[i].result() if futures else run_tool(tool_name, tool_args)
                     result_lines = result.split("\n")
                     preview = result_lines[0][:60]
                     if len(result_lines) > 1:
@@ -313,6 +762,9 @@ def main():
                 # Store clean content + tool_calls in history
                 history_message = {"role": "assistant", "content": clean_content}
                 if tool_calls:
+                    for tc in tool_calls:  # the API expects arguments as a JSON string
+                        if isinstance(tc["function"]["arguments"], dict):
+                            tc["function"]["arguments"] = dumps(tc["function"]["arguments"]).decode()
                     history_message["tool_calls"] = tool_calls
                 messages.append(history_message)
 